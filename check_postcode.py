@@ -1,13 +1,52 @@
 # check_postcode.py
-import os, re, sys, json, urllib.request, smtplib
-from email.mime_text import MIMEText
-from datetime import datetime
-from typing import List, Tuple
-from playwright.sync_api import sync_playwright
+# Heavyweight imports (playwright, smtplib, urllib.request, email.mime) are
+# deferred to their call sites so cold start stays cheap for short runs.
+import asyncio
+import os, re, sys, json
+from datetime import datetime, timezone
+from typing import List, Sequence, Tuple
 
 # === Core config ===
 POSTCODE = os.getenv("POSTCODE", "GL51 8LS").strip()
-POSTCODE_RE = re.compile(r"\bGL51\s?8LS\b", re.IGNORECASE)
+# The space is optional in the wild (GL518LS), hence the \s? substitution.
+POSTCODE_RE = re.compile(
+    r"\b%s\b" % re.escape(POSTCODE).replace("\\ ", r"\s?"), re.IGNORECASE
+)
+
+# Spaced/unspaced spellings for substring matching: the pattern is a fixed
+# string bar one optional space, so memmem on an uppercased body beats
+# running the regex state machine over large text.
+_PC_SPACED = POSTCODE.upper()
+_PC_NOSPACE = POSTCODE.replace(" ", "").upper()
+
+# Bytes forms for scanning raw HTML: bytes.__contains__ is a tight C memmem,
+# so the exact spellings are tried first and the regex only mops up odd casing.
+_PC_SPACED_B = POSTCODE.encode("utf-8")
+_PC_NOSPACE_B = POSTCODE.replace(" ", "").encode("utf-8")
+_PC_RE_BYTES = re.compile(POSTCODE_RE.pattern.encode("ascii"), re.IGNORECASE)
+
+COOKIE_LABELS = (
+    "Accept all", "Accept All", "Accept", "I agree", "Agree",
+    "Continue", "Got it", "OK", "Okay", "Allow all", "Allow All",
+)
+# Anchored so the race keeps the old exact-label semantics: an unanchored
+# alternation would let "Agree" match a "Disagree" button.
+COOKIE_LABEL_RE = re.compile(
+    r"^(?:%s)$" % "|".join(map(re.escape, COOKIE_LABELS)), re.IGNORECASE
+)
+
+VIDEO_PLAY_SELECTORS = (
+    'button[aria-label*="Play" i]',
+    'button:has-text("Play")',
+    'text="Play"',
+    '.jw-icon-play',
+    '.vjs-big-play-button',
+    'video',
+)
+
+# Pages whose per-URL interactions are expensive enough to be worth skipping
+# once another URL has already produced a hit.
+EXPENSIVE_PATHS = ("/video/", "/survey-draw/")
 
 URLS = [
     "https://pickmypostcode.com/",
@@ -16,15 +55,28 @@ URLS = [
     "https://pickmypostcode.com/stackpot/",
 ]
 
+# "1" to skip the plain-HTTP fast path and check everything in the browser
+FORCE_BROWSER = os.getenv("FORCE_BROWSER", "0").strip()
+
 # === Notifications (Slack optional, Email required for this setup) ===
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL", "").strip()
 
 # Defaults set for Jamie/Hotmail; override via env if needed
 DEFAULT_EMAIL = "jamie.lee.23@hotmail.com"
 EMAIL_TO = os.getenv("EMAIL_TO", DEFAULT_EMAIL).strip()
+# Parsed once at import. Email is the required channel for this setup, so an
+# EMAIL_TO that yields no recipients gets a loud warning at startup instead
+# of silently never sending.
+EMAIL_TO_LIST = [e.strip() for e in EMAIL_TO.split(",") if e.strip()]
+if not EMAIL_TO_LIST:
+    print(
+        f"warning: EMAIL_TO={EMAIL_TO!r} has no recipients; email notifications are disabled",
+        file=sys.stderr,
+    )
 EMAIL_FROM = os.getenv("EMAIL_FROM", DEFAULT_EMAIL).strip()
 EMAIL_SUBJECT_PREFIX = os.getenv("EMAIL_SUBJECT_PREFIX", "[Postcode Monitor]")
 EMAIL_ALWAYS = os.getenv("EMAIL_ALWAYS", "0").strip()  # "1" to email even if not found
+_SUBJECT_FMT = f"{EMAIL_SUBJECT_PREFIX} {{status}} for {POSTCODE} — {{date}}"
 
 # Outlook/Hotmail SMTP defaults (override via env if sending from elsewhere)
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.office365.com").strip()
@@ -32,54 +84,189 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USER = os.getenv("SMTP_USER", DEFAULT_EMAIL).strip()
 SMTP_PASS = os.getenv("SMTP_PASS", "").strip()
 
+# Resource types / third-party hosts that can never contain the postcode text.
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+BLOCKED_HOST_FRAGMENTS = (
+    "googletagmanager", "doubleclick", "google-analytics", "facebook", "hotjar",
+)
+
+async def _route_filter(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+        return
+    url = request.url
+    if any(host in url for host in BLOCKED_HOST_FRAGMENTS):
+        await route.abort()
+        return
+    # Everything else (document, script, xhr/fetch) stays: the /video/ player
+    # JS is needed for that page to render the postcode text.
+    await route.continue_()
+
 # === Helpers ===
-def safe_click_text(page, text, timeout=2000):
+async def safe_click_text(page, text, timeout=2000):
     try:
-        page.get_by_text(text, exact=True).click(timeout=timeout)
+        await page.get_by_text(text, exact=True).click(timeout=timeout)
         return True
     except Exception:
         return False
 
-def try_click_selectors(page, selectors: List[str], timeout=2000):
+async def try_click_selectors(page, selectors: Sequence[str], timeout=2000):
+    # Race all candidates in one locator instead of paying the timeout per
+    # selector (worst case used to be len(selectors) * timeout).
+    loc = page.locator(selectors[0])
+    if hasattr(loc, "or_"):
+        for sel in selectors[1:]:
+            loc = loc.or_(page.locator(sel))
+        try:
+            await loc.first.click(timeout=timeout)
+            return True
+        except Exception:
+            return False
+    # Older Playwright without Locator.or_: fall back to the sequential probe.
     for sel in selectors:
         try:
-            page.locator(sel).first.click(timeout=timeout)
+            await page.locator(sel).first.click(timeout=timeout)
             return True
         except Exception:
             continue
     return False
 
-def dismiss_cookies(page):
-    for label in [
-        "Accept all", "Accept All", "Accept", "I agree", "Agree",
-        "Continue", "Got it", "OK", "Okay", "Allow all", "Allow All"
-    ]:
-        if safe_click_text(page, label, timeout=1500):
-            break
-
-def check_one(page, url) -> Tuple[bool, str, str]:
-    page.goto(url, wait_until="domcontentloaded", timeout=30000)
-    dismiss_cookies(page)
-
-    if "/survey-draw" in url:
-        safe_click_text(page, "No thanks, not today", timeout=3000)
-
-    if "/video" in url:
-        try_click_selectors(page, [
-            'button[aria-label*="Play" i]',
-            'button:has-text("Play")',
-            'text="Play"',
-            '.jw-icon-play',
-            '.vjs-big-play-button',
-            'video',
-        ], timeout=2500)
-
-    page.wait_for_timeout(1200)
-    text = page.evaluate("document.body ? document.body.innerText : ''") or ""
-    found = bool(POSTCODE_RE.search(text))
+# Consent is stored per context (and on disk with the persistent profile),
+# so one attempt covers every page in the run. The lock serializes the
+# concurrent checks so only the first page ever probes; marking the attempt
+# regardless of outcome means a warm profile with no banner pays the probe
+# timeout once, not on every page.
+_cookies_attempted = False
+_cookies_lock = asyncio.Lock()
+
+async def dismiss_cookies(page):
+    global _cookies_attempted
+    if _cookies_attempted:
+        return
+    async with _cookies_lock:
+        if _cookies_attempted:
+            return
+        # One locator race over every known label: a single CDP round-trip
+        # and a 2 s bound for the whole cookie dance, instead of 11 x 1.5 s.
+        try:
+            await page.get_by_role("button", name=COOKIE_LABEL_RE).first.click(timeout=2000)
+        except Exception:
+            pass
+        _cookies_attempted = True
+
+def _first_hit_wins(found_event) -> bool:
+    return (
+        found_event is not None
+        and found_event.is_set()
+        and EMAIL_ALWAYS != "1"
+    )
+
+async def check_one(page, url, found_event=None) -> Tuple[bool, str, str]:
+    # One hit anywhere is all the notification needs, so don't even navigate
+    # if a parallel check has already matched.
+    if _first_hit_wins(found_event):
+        return False, url, "skipped (found elsewhere)"
+
+    # page.request reuses the browser's HTTP stack (cookies included) without
+    # parsing or rendering anything, so try the delivered HTML first; only a
+    # miss falls through to the full navigation, and /video/ always renders
+    # because its postcode is injected client-side.
+    if "/video" not in url:
+        try:
+            resp = await page.request.get(url, timeout=10000)
+            if resp.ok and _scan_bytes(await resp.body()):
+                if found_event is not None:
+                    found_event.set()
+                return True, url, "FOUND"
+        except Exception:
+            pass
+
+    await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+
+    # A hit can also land while this page was navigating; in that case skip
+    # the expensive click dances (worst-case ~15 s of selector timeouts on
+    # /video/) and go straight to the read.
+    skip_interactions = _first_hit_wins(found_event) and any(
+        p in url for p in EXPENSIVE_PATHS
+    )
+    if not skip_interactions:
+        await dismiss_cookies(page)
+
+        if "/survey-draw" in url:
+            await safe_click_text(page, "No thanks, not today", timeout=3000)
+
+        if "/video" in url:
+            await try_click_selectors(page, VIDEO_PLAY_SELECTORS, timeout=2500)
+
+        # Wait for the postcode to actually appear rather than sleeping a fixed
+        # 1.2 s; on a miss the timeout bounds us and we fall through to the read.
+        try:
+            await page.wait_for_function(
+                "re => !!document.body && new RegExp(re, 'i').test(document.body.innerText)",
+                arg=POSTCODE_RE.pattern,
+                timeout=3000,
+            )
+        except Exception:
+            pass
+    # Scan the raw HTML as bytes: memmem substring checks catch the common
+    # spellings and the bytes regex mops up odd casing, with no innerText
+    # DOM walk on the page side.
+    found = False
+    try:
+        found = _scan_bytes((await page.content()).encode("utf-8", "ignore"))
+    except Exception:
+        pass
+    if not found:
+        # A miss in the markup is not a miss on the page: NBSP or entity
+        # whitespace between the halves (GL51&nbsp;8LS) never matches the
+        # raw-bytes spellings, so re-check the rendered text. inner_text
+        # goes over the protocol directly; the evaluate (which makes
+        # Chromium compile a JS snippet per call) is the last resort.
+        try:
+            text = await page.locator("body").inner_text(timeout=2000)
+        except Exception:
+            text = await page.evaluate("document.body ? document.body.innerText : ''") or ""
+        upper = text.upper()
+        found = (
+            _PC_SPACED in upper
+            or _PC_NOSPACE in upper
+            or bool(POSTCODE_RE.search(text))  # \s matches NBSP on str
+        )
+    if found and found_event is not None:
+        found_event.set()
     return found, url, ("FOUND" if found else "not found")
 
-def notify_slack(found_on: List[str], summary_lines: List[str]):
+# Cached Slack connection, same idea as _SMTP_CONN: keep-alive to
+# hooks.slack.com amortizes the TLS handshake over repeated posts.
+_SLACK_CONN = None
+
+def _get_slack_conn(host):
+    global _SLACK_CONN
+    if _SLACK_CONN is None:
+        import http.client
+        _SLACK_CONN = http.client.HTTPSConnection(host, timeout=10)
+    return _SLACK_CONN
+
+def _post_slack(data):
+    global _SLACK_CONN
+    from urllib.parse import urlsplit
+    parts = urlsplit(SLACK_WEBHOOK_URL)
+    headers = {"Content-Type": "application/json"}
+    try:
+        conn = _get_slack_conn(parts.netloc)
+        conn.request("POST", parts.path, body=data, headers=headers)
+        conn.getresponse().read()
+    except Exception:
+        # Stale keep-alive (or first-use hiccup): drop and retry once fresh.
+        if _SLACK_CONN is not None:
+            _SLACK_CONN.close()
+            _SLACK_CONN = None
+        conn = _get_slack_conn(parts.netloc)
+        conn.request("POST", parts.path, body=data, headers=headers)
+        conn.getresponse().read()
+
+async def notify_slack(found_on: List[str], summary_lines: List[str]):
     if not SLACK_WEBHOOK_URL:
         return
     msg = (
@@ -89,20 +276,47 @@ def notify_slack(found_on: List[str], summary_lines: List[str]):
     )
     if summary_lines:
         msg += "\n\n" + "\n".join(summary_lines[-8:])  # keep it short
-    data = json.dumps({"text": msg}).encode("utf-8")
-    req = urllib.request.Request(
-        SLACK_WEBHOOK_URL, data=data,
-        headers={"Content-Type": "application/json"}, method="POST",
-    )
-    with urllib.request.urlopen(req, timeout=10) as resp:
-        resp.read()
+    _post_slack(json.dumps({"text": msg}).encode("utf-8"))
+
+# Cached SMTP connection so repeated sends (daemon/loop use) pay the
+# TLS + STARTTLS + LOGIN handshake once instead of per email.
+_SMTP_CONN = None
 
-def notify_email(found_on: List[str], summary_lines: List[str]):
-    if not EMAIL_TO or not EMAIL_FROM or not SMTP_HOST:
+def _get_smtp():
+    global _SMTP_CONN
+    import smtplib
+    if _SMTP_CONN is not None:
+        try:
+            _SMTP_CONN.noop()
+            return _SMTP_CONN
+        except Exception:
+            try:
+                _SMTP_CONN.close()
+            except Exception:
+                pass
+            _SMTP_CONN = None
+    s = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+    s.ehlo()
+    try:
+        s.starttls()
+        s.ehlo()
+    except Exception:
+        pass
+    if SMTP_USER and SMTP_PASS:
+        s.login(SMTP_USER, SMTP_PASS)
+    _SMTP_CONN = s
+    return s
+
+async def notify_email(found_on: List[str], summary_lines: List[str]):
+    global _SMTP_CONN
+    if not EMAIL_TO_LIST or not EMAIL_FROM or not SMTP_HOST:
         return
-    date_str = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
+    import smtplib
+    from email.mime.text import MIMEText
+    now = datetime.now(timezone.utc)  # utcnow() is deprecated in 3.12
+    date_str = f"{now:%Y-%m-%d %H:%M UTC}"
     subject_status = "FOUND" if found_on else "No match"
-    subject = f"{EMAIL_SUBJECT_PREFIX} {subject_status} for {POSTCODE} — {date_str}"
+    subject = _SUBJECT_FMT.format(status=subject_status, date=date_str)
 
     body_lines = []
     if found_on:
@@ -119,19 +333,128 @@ def notify_email(found_on: List[str], summary_lines: List[str]):
     msg["To"] = EMAIL_TO
     msg["Subject"] = subject
 
-    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30) as s:
-        s.ehlo()
-        try:
-            s.starttls()
-            s.ehlo()
-        except Exception:
-            pass
-        if SMTP_USER and SMTP_PASS:
-            s.login(SMTP_USER, SMTP_PASS)
-        s.sendmail(EMAIL_FROM, [e.strip() for e in EMAIL_TO.split(",") if e.strip()], msg.as_string())
+    try:
+        _get_smtp().sendmail(EMAIL_FROM, EMAIL_TO_LIST, msg.as_string())
+    except smtplib.SMTPServerDisconnected:
+        # Server dropped us between the noop and the send; reconnect once.
+        _SMTP_CONN = None
+        _get_smtp().sendmail(EMAIL_FROM, EMAIL_TO_LIST, msg.as_string())
 
-def main():
+def _scan_bytes(raw: bytes) -> bool:
+    return (
+        _PC_SPACED_B in raw
+        or _PC_NOSPACE_B in raw
+        or bool(_PC_RE_BYTES.search(raw))
+    )
+
+async def _http_prescan():
+    """GET the server-rendered HTML of each URL and scan it for the postcode.
+
+    Skipping Chromium entirely is the big win: a plain GET is ~50 ms against
+    seconds of page load. Returns {url: found} for URLs that answered 200;
+    misses and errors are simply absent so the browser pass can retry them
+    (JS-rendered content never shows up here). Empty if httpx is unavailable.
+
+    With selectolax installed, the match runs against the parsed body text
+    (C-backed parser, so still cheap) rather than the raw markup, which
+    avoids false hits inside scripts or attributes; otherwise the raw bytes
+    scan is used.
+    """
+    try:
+        import httpx
+    except ImportError:
+        return {}
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        HTMLParser = None
+    results = {}
+    async with httpx.AsyncClient(follow_redirects=True, timeout=10) as client:
+        resps = await asyncio.gather(
+            *[client.get(u) for u in URLS], return_exceptions=True
+        )
+    for url, resp in zip(URLS, resps):
+        if isinstance(resp, Exception) or resp.status_code != 200:
+            continue
+        if HTMLParser is not None:
+            body = HTMLParser(resp.text).body
+            if body is not None:
+                upper = body.text(separator=" ").upper()
+                if _PC_SPACED in upper or _PC_NOSPACE in upper:
+                    results[url] = True
+                continue
+        if _scan_bytes(resp.content):
+            results[url] = True
+    return results
+
+async def _check(ctx, url, found_event) -> Tuple[bool, str, str]:
+    # One page per URL so the checks can run in parallel; all pages share the
+    # context, so cookies and cached same-origin assets carry across URLs.
+    page = await ctx.new_page()
+    try:
+        return await check_one(page, url, found_event)
+    finally:
+        await page.close()
+
+async def main():
     found_on, summary_lines = [], []
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        ctx =
+
+    # Fast path: plain HTTP + bytes scan. Anything found here never touches
+    # Chromium; anything else (miss, error, JS-rendered) gets the browser.
+    http_hits = {} if FORCE_BROWSER == "1" else await _http_prescan()
+    browser_urls = []
+    for url in URLS:
+        if http_hits.get(url):
+            found_on.append(url)
+            summary_lines.append(f"{url}: FOUND (http)")
+        else:
+            browser_urls.append(url)
+
+    # First hit wins unless every URL's result is wanted (EMAIL_ALWAYS=1):
+    # if the fast path already matched, don't launch Chromium at all.
+    if found_on and EMAIL_ALWAYS != "1":
+        summary_lines += [f"{u}: skipped (found elsewhere)" for u in browser_urls]
+        browser_urls = []
+
+    if browser_urls:
+        from playwright.async_api import async_playwright
+
+        async with async_playwright() as p:
+            # Persistent profile keeps the HTTP cache (and cookie-consent
+            # state) on disk, so repeat cron runs start warm.
+            ctx = await p.chromium.launch_persistent_context(
+                user_data_dir=os.getenv("PMP_PROFILE", "/tmp/pmp_profile"),
+                headless=True,
+                viewport={"width": 1280, "height": 900},
+                args=["--disk-cache-size=52428800"],  # 50 MB is plenty here
+            )
+            # The postcode only ever appears as text; media, fonts, styles and
+            # analytics beacons are dead weight.
+            await ctx.route("**/*", _route_filter)
+            found_event = asyncio.Event()
+            if found_on:
+                found_event.set()
+            results = await asyncio.gather(
+                *[_check(ctx, u, found_event) for u in browser_urls],
+                return_exceptions=True,
+            )
+            await ctx.close()
+
+        for url, result in zip(browser_urls, results):
+            if isinstance(result, Exception):
+                summary_lines.append(f"{url}: ERROR ({result})")
+                continue
+            found, url, status = result
+            summary_lines.append(f"{url}: {status}")
+            if found:
+                found_on.append(url)
+
+    for line in summary_lines:
+        print(line)
+
+    await notify_slack(found_on, summary_lines)
+    if found_on or EMAIL_ALWAYS == "1":
+        await notify_email(found_on, summary_lines)
+
+if __name__ == "__main__":
+    asyncio.run(main())